@@ -1,13 +1,14 @@
 """This Module includes methods for communicating with a MilkMeter device through BLE."""
 import asyncio
-from queue import Empty
+import threading
 
 from ble_nordic import BLE
 from asyncio import TimeoutError
-
-import time
+from uuid_handler import canonical_uuid
 
 _connection_timeout = 10000
+# write prefixes of commands addressed to the BCP service
+_bcp_prefixes = frozenset({b"\x04\x0f\x00\x0d\x60\x00\x00\x1f"})
 
 
 class BLEException(Exception):
@@ -24,40 +25,78 @@ class MMBleClient:
     notifications from both services will be directed to the output queue. This will continue to occur until the
     connection is ended.
 
+    The client can be used as a (async) context manager, which connects on entry and on exit closes the
+    connection, unregisters the notifications queue and the device from the BLE adapter and shuts the
+    client down, reading from it afterwards raises BLEException.
+
     :param mac: the MAC Address of the MilkMeter Device.
     :param timeout: The duration in seconds the methods read and read_all waits for data when timeout=0
     the read will halt until data output. default 0.
     :log_file: the path for the log file. default 'MMBleClient.log'.
     """
 
+    canonical_uuid = staticmethod(canonical_uuid)
+
     def __init__(self, mac: str, timeout: float = 0, log_file: str = "MMBleClient.log"):
         """Initialize MilkMeter device."""
         self.mac = mac
         self.timeout = int(timeout * 1000)
         ble = BLE(log_file, "COM5")
-        self.output = ble.Queue().queue
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = None
+        self.notifications = ble.Queue(self._loop)
+        self._start_loop()
+        self.output = self.notifications.queue
+        self._pushback = None
         self.device = ble.Device(mac, ble.ble_adapter)
         self.services = {
-            "MMP": [
+            "MMP": (
                 "10000000-1000-1000-8000-00805f9baaaa",
                 "10000000-2000-1000-8000-00805f9baaaa",
-            ],
-            "BCP": [
+            ),
+            "BCP": (
                 "40000000-1000-1000-8000-00805f9baaaa",
                 "40000000-2000-1000-8000-00805f9baaaa",
-            ],
+            ),
         }
         self.device.device_services = self.services
+        resolve = self.device._resolve_uuid
+        self._mmp_write, self._mmp_notify = map(resolve, self.services["MMP"])
+        self._bcp_write, self._bcp_notify = map(resolve, self.services["BCP"])
+
+    def _start_loop(self):
+        """Run the client event loop in a background thread, if it is not running already."""
+        if self._loop.is_closed():
+            raise BLEException("The client was shut down.")
+        if self._loop_thread is None or not self._loop_thread.is_alive():
+            self._loop_thread = threading.Thread(
+                target=self._loop.run_forever, daemon=True
+            )
+            self._loop_thread.start()
+
+    def _shutdown_loop(self):
+        """Stop the client event loop, wait for its thread to finish and close the loop."""
+        if self._loop_thread is not None and self._loop_thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+        self._loop.close()
+
+    def _submit(self, coro):
+        """Schedule a coroutine on the client event loop and return its concurrent future."""
+        if self._loop.is_closed():
+            coro.close()
+            raise BLEException("The client was shut down.")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
 
     def start_notify(self):
         """Start listening for MMP and BCP services notifications."""
-        self.device.start_notify(self.services["MMP"][1])
-        self.device.start_notify(self.services["BCP"][1])
+        self.device.start_notify(self._mmp_notify)
+        self.device.start_notify(self._bcp_notify)
 
     def stop_notify(self):
         """Stop listening for MMP and BCP services notifications."""
-        self.device.stop_notify(self.services["MMP"][1])
-        self.device.stop_notify(self.services["BCP"][1])
+        self.device.stop_notify(self._mmp_notify)
+        self.device.stop_notify(self._bcp_notify)
 
     def connect(self):
         """
@@ -66,6 +105,7 @@ class MMBleClient:
         if it cannot be connected.
         On success registers for services notifications.
         """
+        self._start_loop()
         is_connected = self.device.connect(_connection_timeout)
         if is_connected:
             self.start_notify()
@@ -73,64 +113,97 @@ class MMBleClient:
 
     def close(self):
         """Terminate the connection."""
+        if not self.device.is_connected():
+            return False
         try:
-            self.device.stop_notify(self.services["MMP"][1])
-            self.device.stop_notify(self.services["BCP"][1])
+            self.stop_notify()
         except BLEException:
             pass
-        if self.device.is_connected():
-            return self.device.disconnect(_connection_timeout)
-        else:
-            return False
+        return self.device.disconnect(_connection_timeout)
+
+    def __enter__(self):
+        """Connect to the device when entering a with block, raises BLEException if it cannot be connected."""
+        if not self.connect():
+            raise BLEException(f"Failed to connect to {self.mac}.")
+        return self
+
+    def __exit__(self, *exc):
+        """Terminate the connection and release the notifications queue and device observers."""
+        try:
+            self.close()
+        finally:
+            adapter = self.device.ble_adapter
+            adapter.observer_unregister(self.notifications)
+            adapter.observer_unregister(self.device)
+            adapter.driver.observer_unregister(self.device)
+            self._shutdown_loop()
+
+    async def __aenter__(self):
+        """Connect to the device when entering an async with block."""
+        await asyncio.get_running_loop().run_in_executor(None, self.__enter__)
+        return self
+
+    async def __aexit__(self, *exc):
+        """Terminate the connection and release the notifications queue and device observers."""
+        await asyncio.get_running_loop().run_in_executor(None, self.__exit__, *exc)
 
     async def async_read(self, n: int = 1) -> bytes:
-        """Read size bytes from the ble device."""
-        ret = bytearray()
-        bdata = bytearray()
+        """
+        Read size bytes from the ble device.
+
+        The read runs on the client event loop, so it can be awaited from any event loop.
+
+        :param n: number of bytes to read. default: 1
+        :return: the data that was read (bytes)
+        """
+        return await asyncio.wrap_future(self._submit(self._read(n)))
+
+    async def _read(self, n):
+        """Read size bytes from the notifications queue, on the client event loop."""
+        ret = bytearray(n)
+        cursor = 0
+        bdata = b""
         data = b""
-        start_time = time.time()
         remainder = n
-        is_break = False
+        output = self.output
+        popleft = output.popleft
+        new_data = self.notifications.new_data
+        wait_for = asyncio.wait_for
+        now = asyncio.get_running_loop().time
+        timeout_ms = self.timeout
+        deadline = now() + timeout_ms / 1000
 
         try:
             while remainder > 0:
-                if self.timeout <= 0:
-                    data = await self.output.get()
+                if self._pushback:
+                    data = self._pushback
+                    self._pushback = None
+                elif output:
+                    data = popleft()
                 else:
-                    etime = time.time()
-                    etime = etime * 100000 - start_time * 100000
-                    if etime <= self.timeout:
-                        try:
-                            data = self.output.get_nowait()
-                            is_break = True
-                        except Empty:
-                            is_break = True
+                    new_data.clear()
+                    if timeout_ms <= 0:
+                        await new_data.wait()
                     else:
-                        try:
-                            data = self.output.get_nowait()
-                        except Empty:
-                            is_break = True
+                        remaining = deadline - now()
+                        if remaining <= 0:
+                            break
+                        await wait_for(new_data.wait(), remaining)
+                    continue
                 if len(data) > 0:
-                    bdata = bytearray(data)
-                    length = min([remainder, len(data)])
-                    for i in range(length):
-                        ret.append(bdata[0])
-                        del bdata[0]
+                    view = memoryview(data)
+                    length = min(remainder, len(view))
+                    ret[cursor : cursor + length] = view[:length]
+                    bdata = view[length:]
+                    cursor += length
                     remainder -= length
-                if is_break:
-                    break
         except TimeoutError:
             # print("TIMEOUT")
             pass
 
         if len(bdata) > 0:
-            new_queue = BLE.Queue().queue
-            new_queue.put_nowait(bdata)
-            while not self.output.empty():
-                qdata = self.output.get_nowait()
-                new_queue.put_nowait(qdata)
-            self.output = new_queue
-        return bytes(ret)
+            self._pushback = bdata
+        return bytes(ret[:cursor])
 
     def read(self, n: int = 1) -> bytes:
         """
@@ -139,32 +212,37 @@ class MMBleClient:
         :param n: number of bytes to read. default: 1
         :return: the data that was read (bytes)
         """
-        loop = asyncio.get_event_loop()
-        ret = loop.run_until_complete(self.async_read(n))
-        return ret
+        return self._submit(self._read(n)).result()
 
     async def async_read_all(self):
-        """Read all the data stored in the output queue."""
-        first = True
-        ret = bytearray()
-        try:
-            while True:
-                if first:
-                    data = self.output.get_nowait()
-                    print(data)
-                    first = False
-                    for b in data:
-                        ret.append(b)
-                else:
-                    data = self.output.get_nowait()
-                    for b in data:
-                        ret.append(b)
-        except asyncio.QueueEmpty:
-            pass
-        except TimeoutError:
-            pass
-        finally:
-            return bytes(ret)
+        """
+        Read all the data stored in the output queue.
+
+        The read runs on the client event loop, so it can be awaited from any event loop.
+
+        :return: All the data that was read (bytes)
+        """
+        return await asyncio.wrap_future(self._submit(self._read_all()))
+
+    async def _read_all(self):
+        """Read all the data stored in the output queue, on the client event loop."""
+        chunks = []
+        if self._pushback:
+            chunks.append(bytes(self._pushback))
+            self._pushback = None
+        output = self.output
+        new_data = self.notifications.new_data
+        timeout_ms = self.timeout
+        if not chunks and not output and timeout_ms > 0:
+            new_data.clear()
+            try:
+                await asyncio.wait_for(new_data.wait(), timeout_ms / 1000)
+            except TimeoutError:
+                pass
+        chunks.extend(output)
+        output.clear()
+        new_data.clear()
+        return b"".join(chunks)
 
     def read_all(self):
         """
@@ -175,9 +253,7 @@ class MMBleClient:
 
         :return: All the data that was read (bytes)
         """
-        loop = asyncio.get_event_loop()
-        ret = loop.run_until_complete(self.async_read_all())
-        return ret
+        return self._submit(self._read_all()).result()
 
     def write(self, data: bytes) -> int:
         """
@@ -186,8 +262,8 @@ class MMBleClient:
         :param data: the data to be written
         :return: the length of the data written
         """
-        service = "MMP"
-        if data[0:9] == b"\x04\x0f\x00\x0d\x60\x00\x00\x1f":
-            service = "BCP"
-        self.device.write(self.services[service][0], data, 5000)
+        if bytes(data[:8]) in _bcp_prefixes:
+            self.device.write(self._bcp_write, data, 5000)
+        else:
+            self.device.write(self._mmp_write, data, 5000)
         return len(data)
@@ -1,13 +1,67 @@
 """interface to interact with a Bluetooth Low Energy (BLE) adapter."""
 
+import asyncio
+from collections import deque
 from util import setup_adapter, int_list_to_hex_string
 from pc_ble_driver_py.observers import BLEAdapterObserver, BLEDriverObserver
 from queue import Queue, Empty
 from device import Device
 import logging
-from pc_ble_driver_py.ble_driver import BLEGapScanParams
+import os
+import time
+from pc_ble_driver_py.ble_driver import (
+    BLEConfigBase,
+    BLEGapScanParams,
+    BLEGapTimeoutSrc,
+    driver,
+)
+from pc_ble_driver_py.exceptions import NordicSemiException
 
 logger = logging.getLogger(__name__)
+_library_loggers = (logger, logging.getLogger(Device.__module__))
+
+_notification_queue_size = 1024
+
+
+async def _create_event():
+    """Create an asyncio event on the running loop, before Python 3.10 events bind to a loop on creation."""
+    return asyncio.Event()
+
+
+def _event_for(loop):
+    """
+    Create an asyncio event bound to the given loop, whichever thread the loop runs in.
+
+    :param loop: the event loop the event is awaited on.
+    :return: the new asyncio event.
+    """
+    try:
+        if asyncio.get_running_loop() is loop:
+            return asyncio.Event()
+    except RuntimeError:
+        pass
+    if loop.is_running():
+        return asyncio.run_coroutine_threadsafe(_create_event(), loop).result()
+    return loop.run_until_complete(_create_event())
+
+
+def _log_to_file(log_file_path):
+    """
+    Attach a file handler for the given path to the library loggers.
+
+    Unlike logging.basicConfig this leaves the root logger alone, and a path already
+    attached is not added twice.
+
+    :param log_file_path: the path to the log file.
+    """
+    path = os.path.abspath(log_file_path)
+    if any(getattr(h, "baseFilename", None) == path for h in logger.handlers):
+        return
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    for library_logger in _library_loggers:
+        library_logger.addHandler(handler)
+        library_logger.setLevel(logging.INFO)
 
 
 class BLE(BLEDriverObserver):
@@ -25,7 +79,6 @@ class BLE(BLEDriverObserver):
     :ivar Devices: a list of the BLE devices discovered.
     :ivar connect_with: the BLE device to connect with.
     :ivar found_devices: a list of the found BLE devices.
-    :ivar mac_address_to_connect: the MAC address of the BLE device to connect to.
     :ivar conn_handler: the connection handler for handling connection events.
     """
 
@@ -38,9 +91,7 @@ class BLE(BLEDriverObserver):
             raise ValueError("Add valid connection port.")
 
         self.log_file = log_file_path
-        logging.basicConfig(
-            filename=self.log_file, format="%(asctime)s %(message)s", level=logging.INFO
-        )
+        _log_to_file(self.log_file)
         BLE.ble_adapter = setup_adapter(
             port=port,
             auto_flash=False,
@@ -54,7 +105,9 @@ class BLE(BLEDriverObserver):
         self.Devices = []
         self.connect_with = ""
         self.found_devices = []
-        self.mac_address_to_connect = ""
+        self._found_macs = set()
+        self._targets = set()
+        self._connecting = None
         self.conn_handler = None
 
 
@@ -62,35 +115,99 @@ class BLE(BLEDriverObserver):
         """
         Scan for devices with the given MAC addresses and retrieve their metadata.
 
+        A single scan looks for all the addresses, connecting to each device found to discover its services.
+        It ends once every device was connected or the timeout elapsed, only connected devices are returned.
+
         :param mac_addresses_connect_with: A list of strings representing the MAC addresses of the devices to search for.
-        :param timeout_in_millis: An integer representing the maximum amount of time to search for devices, in milliseconds.
+        :param timeout_in_millis: An integer representing the maximum amount of time to search for all the devices, in milliseconds.
         :return: A list of tuples, where each tuple contains a string representing the address of a device and
                  a dictionary representing the metadata associated with that device.
         """
-        timeout_in_secs = timeout_in_millis / 1000
-        logging.info(f"Scanning for {mac_addresses_connect_with}")
-        for address in mac_addresses_connect_with:
-            if self.ble_adapter:
-                self.ble_adapter.driver.observer_register(self)
-                self.mac_address_to_connect = address
-
-                params = BLEGapScanParams(interval_ms=500, window_ms=500, timeout_s=20)
+        logger.info(f"Scanning for {mac_addresses_connect_with}")
+        self.found_devices = []
+        self._found_macs = set()
+        self._connecting = None
+        if self.ble_adapter:
+            # drop events queued after an earlier scan returned
+            while not self.conn_q.empty():
+                self.conn_q.get_nowait()
+            self.ble_adapter.driver.observer_register(self)
+            self._targets = set(mac_addresses_connect_with)
+            deadline = time.monotonic() + timeout_in_millis / 1000
+
+            params = BLEGapScanParams(interval_ms=500, window_ms=500, timeout_s=20)
+            try:
                 self.ble_adapter.driver.ble_gap_scan_start(scan_params=params)
-                try:
-                    self.conn_handler = self.conn_q.get(timeout=timeout_in_secs)
-                    self.ble_adapter.service_discovery(self.conn_handler)
+                while not self._targets <= self._found_macs:
+                    try:
+                        address, conn_handle = self.conn_q.get(
+                            timeout=max(deadline - time.monotonic(), 0)
+                        )
+                    except Empty:
+                        logger.info("Scan done")
+                        break
 
-                except Empty:
-                    logging.info("Scan done")
+                    device_found = self._connecting
+                    if conn_handle is not None:
+                        if device_found is None or device_found[0] != address:
+                            # a connection not initiated by this scan
+                            continue
+                        self.conn_handler = conn_handle
+                        self.found_devices.append(device_found)
+                        self._found_macs.add(address)
+                        logger.info(f"Device connected : {device_found}")
+                        self.ble_adapter.service_discovery(conn_handle)
+                        self.ble_adapter.disconnect(conn_handle)
+                    self._connecting = None
 
-                if self.conn_handler is not None:
-                    self.ble_adapter.disconnect(self.conn_handler)
+                    if not self._targets <= self._found_macs:
+                        # connecting stops the scan, resume it for the remaining devices
+                        self.ble_adapter.driver.ble_gap_scan_start(scan_params=params)
+            finally:
+                self._targets = set()
+                self.ble_adapter.driver.observer_unregister(self)
+                pending = self._connecting
+                self._stop_scan()
+                if pending is not None:
+                    self._disconnect_late(pending[0])
 
-                if not self.found_devices:
-                    logging.info("No devices found")
+            if not self.found_devices:
+                logger.info("No devices found")
 
         return self.found_devices
 
+    def _stop_scan(self):
+        """Stop the scan and cancel a pending connection left by scan_by_mac, if any."""
+        if self._connecting is not None:
+            # BLEDriver has no wrapper for cancelling a connection, call the SoftDevice API
+            err_code = driver.sd_ble_gap_connect_cancel(
+                self.ble_adapter.driver.rpc_adapter
+            )
+            if err_code != driver.NRF_SUCCESS:
+                # the connection completed meanwhile
+                logger.info(f"Failed to cancel the pending connection: {err_code}")
+            self.ble_adapter.conn_in_progress = False
+        else:
+            try:
+                self.ble_adapter.driver.ble_gap_scan_stop()
+            except NordicSemiException:
+                # the scan already timed out
+                pass
+        self._connecting = None
+
+    def _disconnect_late(self, address):
+        """Disconnect a connection to the given address that completed as scan_by_mac timed out."""
+        while True:
+            try:
+                connected_address, conn_handle = self.conn_q.get_nowait()
+            except Empty:
+                return
+            if connected_address == address:
+                try:
+                    self.ble_adapter.disconnect(conn_handle)
+                except NordicSemiException as e:
+                    logger.info(f"Failed to disconnect {address}: {e}")
+
     def on_gap_evt_adv_report(
         self, ble_driver, conn_handle, peer_addr, rssi, adv_type, adv_data
     ):
@@ -104,21 +221,27 @@ class BLE(BLEDriverObserver):
         :param adv_type: An integer representing the type of the advertising packet.
         :param adv_data: A bytes object representing the data in the advertising packet.
         """
-        address_string = ":".join(f"{b:02X}" for b in peer_addr.addr)
-        metadata = {
-            "peer_addr": address_string,
-            "rssi": rssi,
-            "adv_type": adv_type,
-            "adv_data": adv_data,
-            "conn_handle": conn_handle,
-        }
-
-        if address_string == self.mac_address_to_connect:
-            if address_string not in [device[0] for device in self.found_devices]:
-                device_found = (address_string, self.ble_adapter, metadata)
-                self.found_devices.append(device_found)
-                logging.info(f"Device found : {device_found}")
-                self.ble_adapter.connect(peer_addr)
+        address_string = bytes(peer_addr.addr).hex(":").upper()
+        if (
+            address_string in self._targets
+            and address_string not in self._found_macs
+            and self._connecting is None
+        ):
+            metadata = {
+                "peer_addr": address_string,
+                "rssi": rssi,
+                "adv_type": adv_type,
+                "adv_data": adv_data,
+                "conn_handle": conn_handle,
+            }
+            device_found = (address_string, self.ble_adapter, metadata)
+            logger.info(f"Device found : {device_found}")
+            try:
+                self.ble_adapter.connect(peer_addr, tag=BLEConfigBase.conn_cfg_tag)
+            except NordicSemiException as e:
+                logger.info(f"Failed to connect to {address_string}: {e}")
+                return
+            self._connecting = device_found
 
     def on_gap_evt_connected(
         self, ble_driver, conn_handle, peer_addr, role, conn_params
@@ -132,7 +255,7 @@ class BLE(BLEDriverObserver):
         :param role: An integer representing the role of the device in the connection.
         :param conn_params: A BLEGapConnParams object representing the connection parameters of the connection.
         """
-        self.conn_q.put(conn_handle)
+        self.conn_q.put((bytes(peer_addr.addr).hex(":").upper(), conn_handle))
 
     def on_gap_evt_disconnected(self, ble_driver, conn_handle, reason):
         """
@@ -144,19 +267,40 @@ class BLE(BLEDriverObserver):
         """
         self.conn_handler = None
 
+    def on_gap_evt_timeout(self, ble_driver, conn_handle, src):
+        """
+        Event that is called when the scan or a connection attempt timed out, wakes up scan_by_mac to resume the scan.
+
+        :param ble_driver: A BLEDriver object.
+        :param conn_handle: An integer representing the connection handle.
+        :param src: A BLEGapTimeoutSrc representing the source of the timeout.
+        """
+        if src in (BLEGapTimeoutSrc.scan, BLEGapTimeoutSrc.conn):
+            self.conn_q.put((None, None))
+
     class Queue(BLEAdapterObserver):
         """
         A class representing a queue for notifications.
 
+        Notifications arrive on the BLE driver thread and are handed over to the event loop
+        with call_soon_threadsafe, so the queue must only be consumed from that loop.
+        The queue is bounded, when it is full the oldest notification is dropped.
+
+        :param loop: the event loop consuming the queue. default: the current event loop.
+        :param maxlen: the maximum number of notifications kept in the queue.
+
         :ivar ble_adapter: A BLEAdapter object.
-        :ivar queue: A queue for storing notifications.
+        :ivar queue: A bounded deque for storing notifications.
+        :ivar new_data: An asyncio event set whenever a notification is queued.
         """
 
-        def __init__(self):
+        def __init__(self, loop=None, maxlen=_notification_queue_size):
             """Initialize queue that receives notifications  ."""
             self.ble_adapter = BLE.ble_adapter
             self.ble_adapter.observer_register(self)
-            self.queue = Queue()
+            self._loop = loop or asyncio.get_event_loop()
+            self.queue = deque(maxlen=maxlen)
+            self.new_data = _event_for(self._loop)
 
         def on_notification(self, ble_adapter, conn_handle, uuid, data):
             """
@@ -165,15 +309,31 @@ class BLE(BLEDriverObserver):
             :param ble_adapter: A BLEDriver object.
             :param conn_handle: An integer representing the connection handle.
             :param uuid: The UUID of the notification.
-            :param data: The data contained in the notification.
+            :param data: The data contained in the notification, queued as bytes.
             """
-            data_hex = int_list_to_hex_string(data)
-            logging.info(f" Notification received :  {uuid} = {data_hex}.")
-            self.queue.put(data)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    " Notification received :  %s = %s.",
+                    uuid,
+                    int_list_to_hex_string(data),
+                )
+            self._loop.call_soon_threadsafe(self._put, bytes(data))
+
+        def _put(self, data):
+            """Queue a notification and wake up readers waiting for new data."""
+            if len(self.queue) == self.queue.maxlen:
+                logger.warning(
+                    "Notifications queue is full, dropping the oldest notification."
+                )
+            self.queue.append(data)
+            self.new_data.set()
 
         def show_que_log(self):
             """Log the notifications in the queue."""
-            logging.info("Notifications Queue")
-            while not self.queue.empty():
-                item = self.queue.get()
-                logging.info(item)
+            logger.info("Notifications Queue")
+            if not self._loop.is_running():
+                # deliver notifications still pending on the idle loop
+                self._loop.run_until_complete(asyncio.sleep(0))
+            while self.queue:
+                item = self.queue.popleft()
+                logger.info(item)
@@ -1,5 +1,7 @@
+import asyncio
 import time
 from ble_nordic import BLE
+from MMBleNordicClient import MMBleClient
 
 
 def demo():
@@ -20,9 +22,9 @@ def demo():
 
     # chars for testing
     read_characteristic = 0x2A00
-    write_characteristic_uuid = "40000000-1000-1000-8000-00805F9BAAAA"
+    write_characteristic_uuid = "40000000-1000-1000-8000-00805f9baaaa"
     write_characteristic_value = [110]
-    notify_characteristic_uuid = "40000000-2000-1000-8000-00805F9BAAAA"
+    notify_characteristic_uuid = "40000000-2000-1000-8000-00805f9baaaa"
 
     ble = BLE(log_file_path="ble.log", port=connection_port)
 
@@ -70,5 +72,20 @@ def demo():
     ble_queue.show_que_log()
 
 
+async def client_demo():
+    mac_address = "C6:D8:48:B4:61:7C"
+
+    async with MMBleClient(mac_address, 5, log_file="ble.log") as client:
+        dcl_req = bytes.fromhex("AA 0E 01 02 03 01 0E")
+        written = client.write(dcl_req)
+        print("written", written)
+
+        dcl_res = await client.async_read(5)
+        print("dcl_res", dcl_res)
+
+        dcl_res = await client.async_read_all()
+        print("dcl_res", dcl_res)
+
+
 if __name__ == "__main__":
     demo()
@@ -1,22 +1,45 @@
 """This module provides functions for Bluetooth Low Energy device."""
 
 
-from queue import Empty, Queue
+from collections import deque
 from pc_ble_driver_py.ble_driver import (
     BLEGapScanParams,
     BLEGattStatusCode,
     BLEAdvData,
     BLEGapTimeoutSrc,
     BLEUUID,
+    BLEGattcWriteParams,
+    BLEGattWriteOperation,
+    BLEGattExecWriteFlag,
+    BLEGapConnParams,
+    BLEConfigBase,
 )
 from pc_ble_driver_py.exceptions import NordicSemiException
 from pc_ble_driver_py.observers import BLEDriverObserver, BLEAdapterObserver
-from uuid_handler import custom_uuid_base_builder, add_custom_uuid_to_ble
-from func_timeout import func_timeout, FunctionTimedOut
+from uuid_handler import canonical_uuid, add_custom_uuid_to_ble, add_uuid_base
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# SoftDevice default for the number of queued write commands per connection, used for adapters
+# not configured by setup_adapter
+_write_cmd_queue_size = 1
+# ATT MTU every connection starts with, before an MTU exchange
+_default_att_mtu = 23
+# largest link layer payload with data length extension
+_max_data_length = 251
+# shortest connection interval allowed by the specification
+_min_conn_interval_ms = 7.5
+# notifications kept for read_notifications, the oldest are dropped when more are unread
+_notification_buffer_size = 1024
+
+
+def _uuid_key(uuid):
+    """Return a hashable key identifying a BLEUUID by its value and UUID base type."""
+    return uuid.value, uuid.base.type
+
 
 class Device(BLEDriverObserver, BLEAdapterObserver):
     """
@@ -40,38 +63,130 @@ class Device(BLEDriverObserver, BLEAdapterObserver):
         self.ble_adapter.driver.observer_register(self)
         self.conn_handler = None
         self.disconnect_reason = None
-        self.conn_q = Queue()
-        self.notification_q = Queue()
+        self._conn_event = threading.Event()
+        self._disconnect_event = threading.Event()
+        self._pending_conn_handle = None
+        self._notifications = deque(maxlen=_notification_buffer_size)
+        self._notif_event = threading.Event()
         self.mac_address_to_connect = mac_address
+        self._mac_bytes = bytes.fromhex(mac_address.replace(":", ""))
         self.localName = ""
         self.advData = ""
         self.services = []
         self.characteristics = []
         self.descriptors = []
         self.device_services = {}
+        self._uuid_cache = {}
+        self._scan_params_cache = {}
+        self._chars = {}
+        self._handle_by_uuid = {}
+        self._pending_reads = {}
+        self._pending_writes = {}
+        self._gattc_lock = threading.Lock()
+        self.write_cmd_queue_size = getattr(
+            ble_adapter, "write_cmd_tx_queue_size", _write_cmd_queue_size
+        )
+        self.att_mtu = _default_att_mtu
+        self._write_cmds_in_flight = 0
+        self._write_cmd_done = threading.Condition()
+        self._uuid_dispatch = {
+            str: self._build_str_uuid,
+            int: self._build_int_uuid,
+            BLEUUID: lambda uuid: uuid,
+        }
 
+    def _resolve_uuid(self, uuid):
+        """
+        Resolve a UUID given as a string or a 16-bit integer to a BLEUUID object.
 
+        The resolver is picked by the exact type of the UUID, subclasses such as enum members fall
+        back to an isinstance check. Any object that is not a string or an integer is returned unchanged.
 
-    def connect(self, timeout_in_millis: int):
+        :param uuid: The UUID of the characteristic as either a 16-bit integer or a string.
+        :return: The BLEUUID object of the given UUID.
+        """
+        resolve = self._uuid_dispatch.get(type(uuid))
+        if resolve is None:
+            if isinstance(uuid, str):
+                resolve = self._build_str_uuid
+            elif isinstance(uuid, int):
+                resolve = self._build_int_uuid
+            else:
+                return uuid
+        return resolve(uuid)
+
+    def _build_str_uuid(self, uuid):
+        """
+        Build the BLEUUID of a custom 128-bit UUID string.
+
+        Resolved UUIDs are cached by their canonical form, so the custom UUID base is registered
+        with the adapter only the first time it is used, whatever the case or dashes of the string.
+        The string as given is cached too, to skip canonicalizing it again.
+        """
+        ble_uuid = self._uuid_cache.get(uuid)
+        if ble_uuid is None:
+            key = canonical_uuid(uuid)
+            ble_uuid = self._uuid_cache.get(key)
+            if ble_uuid is None:
+                uuid_base = add_uuid_base(self.ble_adapter, key)
+                ble_uuid = BLEUUID(BLEUUID.Standard.unknown, uuid_base)
+                self._uuid_cache[key] = ble_uuid
+            self._uuid_cache[uuid] = ble_uuid
+        return ble_uuid
+
+    def _build_int_uuid(self, uuid):
+        """Build the BLEUUID of a standard 16-bit UUID, cached like custom UUIDs."""
+        ble_uuid = self._uuid_cache.get(uuid)
+        if ble_uuid is None:
+            ble_uuid = BLEUUID(uuid)
+            self._uuid_cache[uuid] = ble_uuid
+        return ble_uuid
+
+    def connect(self, timeout_in_millis: int, conn_interval_ms: float = 15):
         """
         Connect to a BLE device with a specified MAC address.
 
         :param timeout_in_millis: The time in milliseconds to scan and connect to the device.
+        :param conn_interval_ms: The longest connection interval to request once connected, shorter intervals
+        lower the latency of every operation at the cost of power. None keeps the peripheral's parameters.
         :return: True if the connection was successful, False otherwise.
         """
         timeout_in_secs = timeout_in_millis / 1000
         logger.info(f"Scan start, trying to find {self.mac_address_to_connect}")
         scan_duration = timeout_in_secs
-        params = BLEGapScanParams(
-            interval_ms=500, window_ms=500, timeout_s=timeout_in_millis
-        )
+        params = self._scan_params_cache.get(timeout_in_millis)
+        if params is None:
+            params = BLEGapScanParams(
+                interval_ms=500, window_ms=500, timeout_s=timeout_in_millis
+            )
+            self._scan_params_cache[timeout_in_millis] = params
+        self._conn_event.clear()
         self.ble_adapter.driver.ble_gap_scan_start(scan_params=params)
-        try:
-            new_conn = self.conn_q.get(timeout=scan_duration)
+        # register the custom UUIDs while scanning, service discovery needs them
+        uuid_registration = threading.Thread(
+            target=add_custom_uuid_to_ble,
+            args=(self.ble_adapter, self.device_services),
+            daemon=True,
+        )
+        uuid_registration.start()
+        connected = self._conn_event.wait(timeout=scan_duration)
+        uuid_registration.join()
+        if connected:
+            new_conn = self._pending_conn_handle
             self.conn_handler = new_conn
-            add_custom_uuid_to_ble(self.ble_adapter, self.device_services)
             self.ble_adapter.service_discovery(new_conn)
-        except Empty:
+            self._chars = {
+                _uuid_key(char.uuid): char
+                for service in self.ble_adapter.db_conns[new_conn].services
+                for char in service.chars
+            }
+            self._handle_by_uuid = {
+                key: char.handle_value for key, char in self._chars.items()
+            }
+            self._negotiate_mtu(new_conn)
+            if conn_interval_ms is not None:
+                self._update_conn_params(new_conn, conn_interval_ms)
+        else:
             logger.info(
                 f"No device advertising with name {self.mac_address_to_connect} found."
             )
@@ -81,6 +196,47 @@ class Device(BLEDriverObserver, BLEAdapterObserver):
         else:
             return False
 
+    def _negotiate_mtu(self, conn_handle):
+        """
+        Request the adapter's ATT MTU and, where supported, the largest data length for a connection.
+
+        The negotiated MTU is stored in att_mtu, it stays at the default if the peer refuses the exchange.
+
+        :param conn_handle: The handle of the connection.
+        """
+        try:
+            att_mtu = self.ble_adapter.att_mtu_exchange(
+                conn_handle, self.ble_adapter.default_mtu
+            )
+            if att_mtu:
+                self.att_mtu = att_mtu
+        except NordicSemiException as e:
+            logger.info(f"MTU negotiation failed: {e}")
+        logger.info(f"ATT MTU: {self.att_mtu}.")
+        if hasattr(self.ble_adapter, "data_length_update"):
+            try:
+                self.ble_adapter.data_length_update(conn_handle, _max_data_length)
+            except NordicSemiException as e:
+                logger.info(f"Data length update failed: {e}")
+
+    def _update_conn_params(self, conn_handle, conn_interval_ms):
+        """
+        Request a connection interval between the specification minimum and the given interval.
+
+        :param conn_handle: The handle of the connection.
+        :param conn_interval_ms: The longest connection interval to request, in milliseconds.
+        """
+        conn_params = BLEGapConnParams(
+            min_conn_interval_ms=_min_conn_interval_ms,
+            max_conn_interval_ms=max(conn_interval_ms, _min_conn_interval_ms),
+            conn_sup_timeout_ms=4000,
+            slave_latency=0,
+        )
+        try:
+            self.ble_adapter.driver.ble_gap_conn_param_update(conn_handle, conn_params)
+        except NordicSemiException as e:
+            logger.info(f"Connection parameters update failed: {e}")
+
     def disconnect(self, timeout_in_millis: int):
         """
         Disconnect from a BLE device.
@@ -90,15 +246,13 @@ class Device(BLEDriverObserver, BLEAdapterObserver):
         """
         try:
             if self.conn_handler is not None:
-                func_timeout(
-                    timeout_in_millis / 1000,
-                    self.ble_adapter.driver.ble_gap_disconnect,
-                    args=(self.conn_handler,),
-                )
-                self.conn_handler = None
-        except FunctionTimedOut:
-            logger.info("Disconnection request timed out.")
-            return False
+                self._disconnect_event.clear()
+                self.ble_adapter.driver.ble_gap_disconnect(self.conn_handler)
+                if not self._disconnect_event.wait(timeout_in_millis / 1000):
+                    logger.info(
+                        f"Disconnect timed out after {timeout_in_millis} ms for {self.mac_address_to_connect}."
+                    )
+                    return False
         except NordicSemiException as e:
             logger.info("Error occurred while disconnecting: ", str(e))
             return False
@@ -111,10 +265,7 @@ class Device(BLEDriverObserver, BLEAdapterObserver):
 
         :return: True if the device is connected, False otherwise.
         """
-        if self.conn_handler is not None:
-            return True
-        else:
-            return False
+        return self.conn_handler is not None
 
     def is_disconnected(self):
         """
@@ -122,10 +273,7 @@ class Device(BLEDriverObserver, BLEAdapterObserver):
 
         :return: True if the device is disconnected, False otherwise.
         """
-        if self.conn_handle is None:
-            return True
-        else:
-            return False
+        return self.conn_handler is None
 
     def discover_services(self):
         """
@@ -152,23 +300,22 @@ class Device(BLEDriverObserver, BLEAdapterObserver):
         :param timeout_in_millis: Timeout in milliseconds for the operation.
         :return: the data read from the characteristic, as a string.
         """
-        if isinstance(uuid, str):
-            uuid_type = BLEUUID.Standard.unknown
-            uuid_base = custom_uuid_base_builder(uuid)
-            self.ble_adapter.driver.ble_vs_uuid_add(uuid_base)
-            uuid = BLEUUID(uuid_type, uuid_base)
-
-        if isinstance(uuid, int):
-            uuid = BLEUUID(uuid)
+        if not isinstance(uuid, BLEUUID):
+            uuid = self._resolve_uuid(uuid)
 
+        handle = self._find_value_handle(uuid)
+        if handle is None:
+            logger.info(f"Characteristic {uuid} not found.")
+            return False
         try:
-            data = func_timeout(
-                timeout_in_millis / 1000,
-                self.ble_adapter.read_req,
-                args=(self.conn_handler, uuid),
+            data = self._read_handle(handle, timeout_in_millis)
+        except NordicSemiException as e:
+            logger.info(f"Failed to read from characteristic {uuid}: {e}")
+            return False
+        if data is None:
+            logger.info(
+                f"Read operation timed out after {timeout_in_millis} ms for characteristic {uuid}."
             )
-        except FunctionTimedOut as e:
-            logger.info(e, " Timed out while reading from the characteristic")
             return False
 
         if data[0] == BLEGattStatusCode.success:
@@ -177,44 +324,274 @@ class Device(BLEDriverObserver, BLEAdapterObserver):
             return data
         return False
 
-    def write(self, uuid, write_params: bytes, timeout_in_millis: int):
+    def _find_value_handle(self, uuid):
+        """
+        Look up the value handle of a characteristic.
+
+        Characteristics missing from the handles cached on connect are looked up in the database of
+        the connection discovered by the adapter.
+
+        :param uuid: The BLEUUID of the characteristic.
+        :return: The value handle of the characteristic, None if it was not found.
+        """
+        handle = self._handle_by_uuid.get(_uuid_key(uuid))
+        if handle is None and self.conn_handler in self.ble_adapter.db_conns:
+            db_conn = self.ble_adapter.db_conns[self.conn_handler]
+            handle = db_conn.get_char_value_handle(uuid)
+        return handle
+
+    def value_handle(self, uuid):
+        """
+        Look up the value handle of a characteristic of the connected device.
+
+        :param uuid: The UUID of the characteristic as either a 16-bit integer or a string.
+        :return: The value handle of the characteristic, None if it was not discovered.
+        """
+        if not isinstance(uuid, BLEUUID):
+            uuid = self._resolve_uuid(uuid)
+        return self._find_value_handle(uuid)
+
+    def read_cached(self, handle: int, timeout_ms: int):
+        """
+        Read the raw value of a characteristic by its value handle.
+
+        Skips the UUID handling and decoding of read, for tight polling loops on a known characteristic.
+
+        :param handle: The value handle of the characteristic, as returned by value_handle.
+        :param timeout_ms: Timeout in milliseconds for the operation.
+        :return: the value read from the characteristic, as bytes, or False on failure.
+        """
+        try:
+            rsp = self._read_handle(handle, timeout_ms)
+        except NordicSemiException as e:
+            logger.info(f"Failed to read handle {handle}: {e}")
+            return False
+        if rsp is None:
+            logger.info(
+                f"Read operation timed out after {timeout_ms} ms for handle {handle}."
+            )
+            return False
+        if rsp[0] != BLEGattStatusCode.success:
+            logger.info(f"Failed to read handle {handle}: {rsp[0]}")
+            return False
+        return bytes(rsp[1])
+
+    def write(
+        self, uuid, write_params: bytes, timeout_in_millis: int, response: bool = None
+    ):
         """
         Write a value to a BLE characteristic identified by UUID.
 
         :param uuid: The UUID of the characteristic as either a 16-bit integer or a string.
         :param write_params: The data to be written to the characteristic as a bytes object.
         :param timeout_in_millis: Timeout in milliseconds for the operation.
+        :param response: True to have the peer acknowledge the write, False to write without response.
+        By default a write without response is used when the characteristic supports it.
         :return: True if the write was successful, False otherwise.
         """
-        if isinstance(uuid, str):
-            uuid_type = BLEUUID.Standard.unknown
-            uuid_base = custom_uuid_base_builder(uuid)
-            self.ble_adapter.driver.ble_vs_uuid_add(uuid_base)
-            uuid = BLEUUID(uuid_type, uuid_base)
-
-        if isinstance(uuid, int):
-            uuid = BLEUUID(uuid)
+        if not isinstance(uuid, BLEUUID):
+            uuid = self._resolve_uuid(uuid)
+        key = _uuid_key(uuid)
+        if response is None:
+            char = self._chars.get(key)
+            response = char is None or not char.char_props.write_wo_resp
+        handle = self._find_value_handle(uuid)
+        if handle is None:
+            logger.error(f"Characteristic {uuid} not found.")
+            return False
 
         try:
-            func_timeout(
-                timeout_in_millis / 1000,
-                self.ble_adapter.write_req,
-                args=(self.conn_handler, uuid, write_params),
-            )
-        except FunctionTimedOut:
-            logger.error(
-                f"Write operation timed out after {timeout_in_millis} ms for characteristic {uuid}."
-            )
-            return False
+            if response:
+                rsp = self._write_handle(handle, write_params, timeout_in_millis)
+                done = rsp is not None
+                if done and rsp[0] != BLEGattStatusCode.success:
+                    logger.error(
+                        f"Failed to write characteristic value {write_params !r} to characteristic {uuid !r}: {rsp[0]}"
+                    )
+                    return False
+            else:
+                done = self._write_cmds(
+                    handle, [write_params], time.monotonic() + timeout_in_millis / 1000
+                )
         except NordicSemiException as e:
             logger.error(
                 f"Failed to write characteristic value {write_params !r} to characteristic {uuid !r}: {e !r}"
             )
             return False
+        if not done:
+            if self.conn_handler is None:
+                logger.error(f"Disconnected while writing to characteristic {uuid}.")
+            else:
+                logger.error(
+                    f"Write operation timed out after {timeout_in_millis} ms for characteristic {uuid}."
+                )
+            return False
 
         logger.info(f"Wrote {write_params !r} to characteristic {uuid}.")
         return True
 
+    def write_many(self, uuid, payloads, timeout_in_millis: int):
+        """
+        Write several values to a BLE characteristic using write without response.
+
+        The payloads are pipelined, up to write_cmd_queue_size commands are in flight at once
+        (the write command TX queue size configured by setup_adapter).
+        The order of the payloads is preserved but, as for any write without response, delivery is best-effort.
+
+        :param uuid: The UUID of the characteristic as either a 16-bit integer or a string.
+        :param payloads: The values to be written to the characteristic, each as a bytes object.
+        :param timeout_in_millis: Timeout in milliseconds for writing all the payloads.
+        :return: True if all the payloads were sent, False otherwise or if the device disconnected.
+        """
+        if not isinstance(uuid, BLEUUID):
+            uuid = self._resolve_uuid(uuid)
+        handle = self._find_value_handle(uuid)
+        if handle is None:
+            logger.error(f"Characteristic {uuid} not found.")
+            return False
+
+        deadline = time.monotonic() + timeout_in_millis / 1000
+        try:
+            sent = self._write_cmds(handle, payloads, deadline)
+        except NordicSemiException as e:
+            logger.error(f"Failed to write to characteristic {uuid !r}: {e !r}")
+            return False
+
+        if not sent:
+            if self.conn_handler is None:
+                logger.error(f"Disconnected while writing to characteristic {uuid}.")
+            else:
+                logger.error(
+                    f"Write operation timed out after {timeout_in_millis} ms for characteristic {uuid}."
+                )
+            return False
+        logger.info(f"Wrote {len(payloads)} values to characteristic {uuid}.")
+        return True
+
+    def _write_cmds(self, handle, payloads, deadline):
+        """
+        Write values to an attribute handle using write without response and wait until they are transmitted.
+
+        :param handle: The value handle of the characteristic.
+        :param payloads: The values to be written, each as a bytes object.
+        :param deadline: The time.monotonic() value by which all the payloads must be transmitted.
+        :return: True if all the payloads were transmitted before the deadline, False otherwise.
+        """
+        done = self._write_cmd_done
+        conn_handle = self.conn_handler
+        for payload in payloads:
+            with done:
+                if not done.wait_for(
+                    lambda: self._write_cmds_in_flight < self.write_cmd_queue_size,
+                    deadline - time.monotonic(),
+                ):
+                    return False
+                if self.conn_handler != conn_handle:
+                    # disconnected meanwhile, the commands in flight were dropped
+                    return False
+                self._write_cmds_in_flight += 1
+            write_params = BLEGattcWriteParams(
+                BLEGattWriteOperation.write_cmd,
+                BLEGattExecWriteFlag.unused,
+                handle,
+                payload,
+                0,
+            )
+            try:
+                self.ble_adapter.driver.ble_gattc_write(self.conn_handler, write_params)
+            except NordicSemiException:
+                with done:
+                    self._write_cmds_in_flight -= 1
+                raise
+        with done:
+            sent = done.wait_for(
+                lambda: self._write_cmds_in_flight == 0, deadline - time.monotonic()
+            )
+            return sent and self.conn_handler == conn_handle
+
+    def _read_handle(self, handle, timeout_in_millis):
+        """
+        Read an attribute by its handle, waiting for the matching read response.
+
+        :param handle: The handle of the attribute.
+        :param timeout_in_millis: Timeout in milliseconds for the response.
+        :return: The (status, data) of the read response, or None if it timed out.
+        """
+        return self._gattc_request(
+            self._pending_reads,
+            handle,
+            lambda: self.ble_adapter.driver.ble_gattc_read(
+                self.conn_handler, handle, 0
+            ),
+            timeout_in_millis,
+        )
+
+    def _write_handle(self, handle, data, timeout_in_millis):
+        """
+        Write an attribute by its handle with a write request, waiting for the matching write response.
+
+        :param handle: The handle of the attribute.
+        :param data: The value to be written as a bytes object.
+        :param timeout_in_millis: Timeout in milliseconds for the response.
+        :return: The (status, data) of the write response, or None if it timed out.
+        """
+        write_params = BLEGattcWriteParams(
+            BLEGattWriteOperation.write_req,
+            BLEGattExecWriteFlag.unused,
+            handle,
+            data,
+            0,
+        )
+        return self._gattc_request(
+            self._pending_writes,
+            handle,
+            lambda: self.ble_adapter.driver.ble_gattc_write(
+                self.conn_handler, write_params
+            ),
+            timeout_in_millis,
+        )
+
+    def _gattc_request(self, pending, handle, request, timeout_in_millis):
+        """
+        Send a GATT client request on an attribute handle and wait for its response.
+
+        The SoftDevice runs one GATT client procedure per connection at a time, requests are
+        serialized so concurrent callers wait their turn within their timeout instead of
+        replacing each other's waiter.
+
+        :param pending: The requests awaiting a response by handle, either _pending_reads or _pending_writes.
+        :param handle: The handle of the attribute.
+        :param request: Callable sending the request to the driver.
+        :param timeout_in_millis: Timeout in milliseconds for the response.
+        :return: The (status, data) of the response, or None if it timed out or the device disconnected.
+        """
+        deadline = time.monotonic() + timeout_in_millis / 1000
+        if not self._gattc_lock.acquire(timeout=timeout_in_millis / 1000):
+            return None
+        try:
+            event, rsp = pending[handle] = threading.Event(), deque(maxlen=1)
+            try:
+                request()
+                event.wait(max(deadline - time.monotonic(), 0))
+                return rsp.popleft() if rsp else None
+            finally:
+                pending.pop(handle, None)
+        finally:
+            self._gattc_lock.release()
+
+    def _complete_gattc_request(
+        self, pending, conn_handle, status, error_handle, attr_handle, data
+    ):
+        """Hand a GATT client response to the request waiting on its handle, if any."""
+        if conn_handle != self.conn_handler:
+            return
+        handle = attr_handle if status == BLEGattStatusCode.success else error_handle
+        waiter = pending.get(handle)
+        if waiter is not None:
+            event, rsp = waiter
+            rsp.append((status, data))
+            event.set()
+
     def start_notify(self, uuid):
         """
         Enable notifications for a specific characteristic identified by a given UUID.
@@ -222,14 +599,8 @@ class Device(BLEDriverObserver, BLEAdapterObserver):
         :param uuid: The UUID of the characteristic as either a 16-bit integer or a string.
         :return: True if notification enabling was successful, False otherwise.
         """
-        if isinstance(uuid, str):
-            uuid_type = BLEUUID.Standard.unknown
-            uuid_base = custom_uuid_base_builder(uuid)
-            self.ble_adapter.driver.ble_vs_uuid_add(uuid_base)
-            uuid = BLEUUID(uuid_type, uuid_base)
-
-        if isinstance(uuid, int):
-            uuid = BLEUUID(uuid)
+        if not isinstance(uuid, BLEUUID):
+            uuid = self._resolve_uuid(uuid)
 
         try:
             self.ble_adapter.enable_notification(self.conn_handler, uuid)
@@ -246,14 +617,8 @@ class Device(BLEDriverObserver, BLEAdapterObserver):
         :param uuid: The UUID of the characteristic for which notifications should be stopped.
         :return: Returns True if the notifications were successfully stopped, otherwise False.
         """
-        if isinstance(uuid, str):
-            uuid_type = BLEUUID.Standard.unknown
-            uuid_base = custom_uuid_base_builder(uuid)
-            self.ble_adapter.driver.ble_vs_uuid_add(uuid_base)
-            uuid = BLEUUID(uuid_type, uuid_base)
-
-        if isinstance(uuid, int):
-            uuid = BLEUUID(uuid)
+        if not isinstance(uuid, BLEUUID):
+            uuid = self._resolve_uuid(uuid)
 
         try:
             self.ble_adapter.disable_notification(self.conn_handler, uuid)
@@ -263,11 +628,44 @@ class Device(BLEDriverObserver, BLEAdapterObserver):
             return False
         return True
 
+    def read_notifications(self, size=None, timeout_in_millis: int = 0):
+        """
+        Read the data of the notifications received from the device.
+
+        Without a size, the notifications already received are returned without waiting.
+        With a size, notifications are consumed as they arrive until at least size bytes were read
+        or the timeout elapsed.
+
+        :param size: The minimum number of bytes to read, None to read the received notifications.
+        :param timeout_in_millis: Timeout in milliseconds for reading size bytes.
+        :return: The data of the consumed notifications, as bytes.
+        """
+        notifications = self._notifications
+        out = bytearray()
+        if size is None:
+            while notifications:
+                out.extend(notifications.popleft())
+            return bytes(out)
+
+        deadline = time.monotonic() + timeout_in_millis / 1000
+        while len(out) < size:
+            if notifications:
+                out.extend(notifications.popleft())
+                continue
+            # clear before re-checking so a notification appended meanwhile is not missed
+            self._notif_event.clear()
+            if notifications:
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._notif_event.wait(remaining):
+                break
+        return bytes(out)
+
     def on_gap_evt_connected(
         self, ble_driver, conn_handle, peer_addr, role, conn_params
     ):
         """
-        Event that called by the BLE driver when a new connection has been established adds connection to a queue.
+        Event that called by the BLE driver when a new connection has been established signals the connection.
 
         :param ble_driver: The BLE driver that called this method.
         :param conn_handle: The handle of the new connection.
@@ -275,7 +673,67 @@ class Device(BLEDriverObserver, BLEAdapterObserver):
         :param role: The role of the local device in the connection (central or peripheral).
         :param conn_params: The parameters used for the connection.
         """
-        self.conn_q.put(conn_handle)
+        self._pending_conn_handle = conn_handle
+        self._conn_event.set()
+
+    def on_gattc_evt_write_cmd_tx_complete(self, ble_driver, conn_handle, count):
+        """
+        Event that called by the BLE driver when queued write commands have been transmitted.
+
+        :param ble_driver: The BLE driver that called this method.
+        :param conn_handle: The handle of the connection.
+        :param count: The number of write commands transmitted.
+        """
+        if conn_handle != self.conn_handler:
+            return
+        with self._write_cmd_done:
+            self._write_cmds_in_flight = max(self._write_cmds_in_flight - count, 0)
+            self._write_cmd_done.notify_all()
+
+    def on_gattc_evt_read_rsp(
+        self, ble_driver, conn_handle, status, error_handle, attr_handle, offset, data
+    ):
+        """
+        Event that called by the BLE driver when a read response is received.
+
+        :param ble_driver: The BLE driver that called this method.
+        :param conn_handle: The handle of the connection.
+        :param status: The GATT status of the read.
+        :param error_handle: The handle of the attribute that caused the error, if any.
+        :param attr_handle: The handle of the attribute read.
+        :param offset: The offset of the data read.
+        :param data: The data read.
+        """
+        self._complete_gattc_request(
+            self._pending_reads, conn_handle, status, error_handle, attr_handle, data
+        )
+
+    def on_gattc_evt_write_rsp(
+        self,
+        ble_driver,
+        conn_handle,
+        status,
+        error_handle,
+        attr_handle,
+        write_op,
+        offset,
+        data,
+    ):
+        """
+        Event that called by the BLE driver when a write response is received.
+
+        :param ble_driver: The BLE driver that called this method.
+        :param conn_handle: The handle of the connection.
+        :param status: The GATT status of the write.
+        :param error_handle: The handle of the attribute that caused the error, if any.
+        :param attr_handle: The handle of the attribute written.
+        :param write_op: The write operation performed.
+        :param offset: The offset of the data written.
+        :param data: The data written.
+        """
+        self._complete_gattc_request(
+            self._pending_writes, conn_handle, status, error_handle, attr_handle, data
+        )
 
     def on_gap_evt_disconnected(self, ble_driver, conn_handle, reason):
         """
@@ -285,8 +743,21 @@ class Device(BLEDriverObserver, BLEAdapterObserver):
         :param conn_handle: The handle of the disconnected connection.
         :param reason: The reason for the disconnection.
         """
+        if conn_handle != self.conn_handler:
+            return
         self.conn_handler = None
         self.disconnect_reason = reason
+        self.att_mtu = _default_att_mtu
+        self._uuid_cache.clear()
+        self._chars = {}
+        self._handle_by_uuid = {}
+        for pending in (self._pending_reads, self._pending_writes):
+            for event, _ in list(pending.values()):
+                event.set()
+        with self._write_cmd_done:
+            self._write_cmds_in_flight = 0
+            self._write_cmd_done.notify_all()
+        self._disconnect_event.set()
 
     def on_gap_evt_timeout(self, ble_driver, conn_handle, src):
         """
@@ -312,6 +783,9 @@ class Device(BLEDriverObserver, BLEAdapterObserver):
         :param adv_type: The type of the advertising packet.
         :param adv_data: The data contained in the advertising packet.
         """
+        if bytes(peer_addr.addr) != self._mac_bytes:
+            return
+
         if BLEAdvData.Types.complete_local_name in adv_data.records:
             dev_name_list = adv_data.records[BLEAdvData.Types.complete_local_name]
             dev_name = "".join(chr(e) for e in dev_name_list)
@@ -335,12 +809,11 @@ class Device(BLEDriverObserver, BLEAdapterObserver):
                 dev_adv_data = adv_data.records[
                     BLEAdvData.Types.manufacturer_specific_data
                 ]
-                dev_adv_data = "".join(f"{b:02X}" for b in dev_adv_data)
+                dev_adv_data = bytes(dev_adv_data).hex().upper()
                 self.advData = dev_adv_data
 
-        address_string = ":".join(f"{b:02X}" for b in peer_addr.addr)
-        if address_string == self.mac_address_to_connect:
-            self.ble_adapter.connect(peer_addr)
+        # connect with the configuration tag setup_adapter configured the MTU and write queue for
+        self.ble_adapter.connect(peer_addr, tag=BLEConfigBase.conn_cfg_tag)
 
     def on_notification(self, ble_adapter, conn_handle, uuid, data):
         """
@@ -351,13 +824,16 @@ class Device(BLEDriverObserver, BLEAdapterObserver):
         :param uuid: The UUID of the characteristic that sent the notification.
         :param data: The data contained in the notification.
         """
-        self.notification_q.put(data)
+        if conn_handle != self.conn_handler:
+            return
+        self._notifications.append(data)
+        self._notif_event.set()
 
     def on_gattc_evt_prim_srvc_disc_rsp(
         self, ble_driver, conn_handle, status, services
     ):
         """
-        Handle the services discovery response event and append the discovered services' information.
+        Handle the services discovery response event and keep the discovered services.
 
         :param ble_driver: The BLE driver that called this method.
         :param conn_handle: The handle of the connection.
@@ -365,33 +841,28 @@ class Device(BLEDriverObserver, BLEAdapterObserver):
         :param services: The list of discovered services.
 
         """
-        services_str = "\n ".join(str(s) for s in services)
-        self.services.append(services_str)
+        self.services.extend(services)
 
     def on_gattc_evt_char_disc_rsp(
         self, ble_driver, conn_handle, status, characteristics
     ):
         """
-        Handle the characteristics discovery response event and append the discovered characteristic information.
+        Handle the characteristics discovery response event and keep the discovered characteristics.
 
         :param ble_driver: The BLE driver that called this method.
         :param conn_handle: The handle of the connection.
         :param status: The status of the request.
         :param characteristics: The list of discovered characteristics.
         """
-        chars_str = "\n ".join(str(c) for c in characteristics)
-        if chars_str:
-            self.characteristics.append(chars_str)
+        self.characteristics.extend(characteristics)
 
     def on_gattc_evt_desc_disc_rsp(self, ble_driver, conn_handle, status, descriptors):
         """
-        Handle the descriptors discovery response event and append the discovered descriptors information.
+        Handle the descriptors discovery response event and keep the discovered descriptors.
 
         :param ble_driver: The BLE driver that called this method.
         :param conn_handle: The handle of the connection.
         :param status: The status of the request.
         :param descriptors: The list of discovered descriptors.
         """
-        descs_str = "\n ".join(str(c) for c in descriptors)
-        if descs_str:
-            self.descriptors.append(descs_str)
+        self.descriptors.extend(descriptors)
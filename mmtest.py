@@ -12,7 +12,7 @@ from MMBleNordicClient import MMBleClient
 
 mac = "8453DFBF-12E8-4E9F-930C-6900CBC58BD7"
 mm = "C6:D8:48:B4:61:7C"
-bc = MMBleClient(mm, 5000, log_file="mm1.log")
+bc = MMBleClient(mm, 5, log_file="mm1.log")
 
 bc.connect()
 
@@ -4,11 +4,17 @@ from pc_ble_driver_py.ble_driver import (
     BLEDriver,
     BLEConfig,
     BLEConfigConnGatt,
+    BLEConfigConnGattc,
 )
 from pc_ble_driver_py.ble_adapter import BLEAdapter
 
 Settings = Settings
 
+# largest ATT MTU supported by the S132/S140 SoftDevices
+_max_att_mtu = 247
+# write commands the SoftDevice queues per connection, bounds how many Device.write_many pipelines
+_write_cmd_tx_queue_size = 8
+
 
 def setup_adapter(
     port,
@@ -24,7 +30,11 @@ def setup_adapter(
     The Settings.current() call retrieves the current settings.
     The BLEDriver class is then initialized with the specified settings and a BLE adapter is created using the driver.
     Finally, the function sets the attributes of the connection GATT configuration using BLEConfigConnGatt
-    and sets the adapter's configuration using adapter.driver.ble_cfg_set.
+    and sets the adapter's configuration using adapter.driver.ble_cfg_set, allowing the largest ATT MTU
+    so connections can negotiate it.
+    It also enlarges the write command TX queue of the connections with BLEConfigConnGattc and records
+    its size in adapter.write_cmd_tx_queue_size, for devices to pipeline writes without response.
+    Both configurations apply to connections made with the BLEConfigBase.conn_cfg_tag tag.
     The function then enables the BLE adapter and returns the adapter to the caller.
     """
     driver = BLEDriver(
@@ -38,15 +48,18 @@ def setup_adapter(
 
     adapter = BLEAdapter(driver)
     adapter.driver.open()
+    adapter.default_mtu = _max_att_mtu
     gatt_cfg = BLEConfigConnGatt()
     gatt_cfg.att_mtu = adapter.default_mtu
     adapter.driver.ble_cfg_set(BLEConfig.conn_gatt, gatt_cfg)
+    gattc_cfg = BLEConfigConnGattc()
+    gattc_cfg.write_cmd_tx_queue_size = _write_cmd_tx_queue_size
+    adapter.driver.ble_cfg_set(BLEConfig.conn_gattc, gattc_cfg)
+    adapter.write_cmd_tx_queue_size = _write_cmd_tx_queue_size
     adapter.driver.ble_enable()
     return adapter
 
 
 def int_list_to_hex_string(int_list):
     """Covert received data form int array to hex string."""
-    hex_list = [format(x, "02X") for x in int_list]
-    hex_string = " ".join(hex_list)
-    return hex_string
+    return bytes(int_list).hex(" ").upper()
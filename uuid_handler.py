@@ -1,20 +1,37 @@
 """uuid handler class."""
+import uuid
+import weakref
+
 from pc_ble_driver_py.ble_driver import BLEUUID, BLEUUIDBase
 
+# UUID bases already added to each adapter, by the bytes of the UUID they were built from
+_added_bases = weakref.WeakKeyDictionary()
+
+
+def canonical_uuid(uuid_string):
+    """
+    Take a string representation of a UUID and return it in its canonical form.
+
+    The canonical form is the lowercase, dash separated 36 characters string, so UUIDs given in
+    a different case or without dashes compare and hash equal.
+
+    :param uuid_string: A string representation of a UUID.
+    :return: The canonical string representation of the given UUID.
+    """
+    return str(uuid.UUID(uuid_string))
+
 
 def string_to_hex_list(uuid_string):
     """
     Take a string representation of a UUID as an argument and returns a list of its hexadecimal values.
 
     The function first removes any dashes ("-") from the UUID string using the `replace` method,
-    and then iterates through the string two characters at a time, converting each pair of characters to its
-    corresponding hexadecimal value using the `int` function with a base of 16.
+    and then decodes the remaining hex digits with `bytes.fromhex`, one value per pair of characters.
 
     :param uuid_string: A string representation of a UUID.
     :return: A list of hexadecimal values extracted from the given UUID string.
     """
-    uuid_string = uuid_string.replace("-", "")
-    return [int(uuid_string[i : i + 2], 16) for i in range(0, len(uuid_string), 2)]
+    return list(bytes.fromhex(uuid_string.replace("-", "")))
 
 
 def custom_uuid_base_builder(uuid_string):
@@ -58,22 +75,49 @@ def standard_uuid_builder(uuid):
     return standard_uuid
 
 
+def add_uuid_base(adapter, uuid_string):
+    """
+    Add the base of a custom UUID to the BLE adapter, unless it was added already.
+
+    :param adapter: The BLE adapter to add the UUID base to.
+    :param uuid_string: A string representation of a custom UUID.
+    :return: The `BLEUUIDBase` added to the adapter, with its type assigned by the adapter.
+    """
+    hex_list = string_to_hex_list(uuid_string)
+    added_bases = _added_bases.setdefault(adapter, {})
+    base_key = bytes(hex_list)
+    base_uuid = added_bases.get(base_key)
+    if base_uuid is None:
+        base_uuid = BLEUUIDBase(hex_list)
+        adapter.driver.ble_vs_uuid_add(base_uuid)
+        added_bases[base_key] = base_uuid
+    return base_uuid
+
+
 def add_custom_uuid_to_ble(adapter, devices):
     """
     Add custom UUIDs to the BLE adapter.
 
+    UUIDs listed more than once, or already added to the same adapter by an earlier call, are
+    not sent to the adapter again.
+
     :param adapter: The BLE adapter to add the UUIDs to.
     :param devices: A dictionary containing device names and corresponding UUIDs to add to the adapter.
     :return: A boolean indicating whether or not all UUIDs were successfully added to the adapter.
     """
     success = True
-    for key, values in devices.items():
+    uuid_strings = set()
+    for values in devices.values():
         for value in values:
             try:
-                hex_list = string_to_hex_list(value)
-                base_uuid = BLEUUIDBase(hex_list)
-                adapter.driver.ble_vs_uuid_add(base_uuid)
-            except Exception as e:
+                uuid_strings.add(canonical_uuid(value))
+            except ValueError as e:
                 success = False
                 print(f"Failed to add {value}: {e}")
+    for value in uuid_strings:
+        try:
+            add_uuid_base(adapter, value)
+        except Exception as e:
+            success = False
+            print(f"Failed to add {value}: {e}")
     return success